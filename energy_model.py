@@ -0,0 +1,148 @@
+import functools
+
+import numpy as np
+import sympy as sp
+
+# 三角形スイマーの回転角 theta に対するポテンシャルエネルギー
+#   ext   : 外部磁場と永久磁石の相互作用
+#   dd    : 永久磁石同士の双極子相互作用
+#   ext_p : 外部磁場で誘起された常磁性粒子との相互作用
+#   dd_p  : 永久磁石の磁場で誘起された常磁性粒子との相互作用
+# エネルギーは theta の2次までの三角多項式になるので、
+# 1, cos, sin, cos2, sin2 の係数として微分まで含めて生成する。
+# 係数は微分の階数ごとに別の関数にして、必要な階数の分だけ評価する。
+
+TERMS = ('ext', 'dd', 'ext_p', 'dd_p')
+MODELS = {
+    'old': ('ext', 'dd', 'ext_p'),
+    'new': TERMS,
+}
+
+_theta, _alpha, _gamma, _b_x, _b_y, _k_ext = sp.symbols(
+    'theta alpha gamma b_x b_y k_ext', real=True)
+_PARAMS = (_alpha, _gamma, _b_x, _b_y, _k_ext)
+
+
+def _symbolic_terms():
+    moment = sp.Matrix([-sp.sin(_theta), sp.cos(_theta)])
+    b_ext = sp.Matrix([_b_x, _b_y])
+    n_para = sp.Matrix([3*sp.sqrt(3)/4, sp.Rational(5, 4)])
+    # 永久磁石が常磁性粒子の位置につくる磁場 (alpha で規格化)
+    b_perm = 3*sp.sqrt(3)*sp.sin(_theta - sp.pi/3) + 2*sp.cos(_theta)
+
+    return {
+        'ext': -_k_ext * _alpha * moment.dot(b_ext),
+        'dd': 3 - sp.cos(2*_theta),
+        'ext_p': -4 * _gamma * _b_y * moment.dot(n_para),
+        'dd_p': 4 * (_gamma/_alpha) * b_perm * moment.dot(n_para),
+    }
+
+
+def _fourier_coefficients(expr):
+    # expr を [1, cos, sin, cos2, sin2] の係数に分解する
+    z = sp.Symbol('z')
+    poly = sp.expand_trig(expr).subs({
+        sp.sin(_theta): (z - 1/z) / (2*sp.I),
+        sp.cos(_theta): (z + 1/z) / 2,
+        })
+    poly = sp.expand(poly)
+    if poly.has(_theta):
+        raise ValueError('energy is not a trigonometric polynomial in theta')
+
+    c = {k: poly.coeff(z, k) for k in range(-2, 3)}
+    if sp.expand(poly - sum(c[k] * z**k for k in c)) != 0:
+        raise ValueError('energy has harmonics higher than 2*theta')
+
+    return [
+        sp.simplify(c[0]),
+        sp.simplify(c[1] + c[-1]),
+        sp.simplify(sp.I*(c[1] - c[-1])),
+        sp.simplify(c[2] + c[-2]),
+        sp.simplify(sp.I*(c[2] - c[-2])),
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def _coefficient_function(terms, order):
+    symbolic = _symbolic_terms()
+    energy = sum(symbolic[t] for t in terms)
+    row = _fourier_coefficients(sp.diff(energy, _theta, order))
+    # cse で sqrt(3) などの共通部分を1回だけ評価する (スカラー引数では呼び出しの大半を占める)
+    return sp.lambdify(_PARAMS, row, modules='numpy', cse=True)
+
+
+def _model_terms(model):
+    if isinstance(model, str):
+        return MODELS[model]
+    terms = tuple(model)
+    for t in terms:
+        if t not in TERMS:
+            raise ValueError('unknown energy term: {}'.format(t))
+    return terms
+
+
+def coefficients(alpha, gamma, b_y, b_x=0.0, model='new', k_ext=4.0, orders=(0, 1, 2)):
+    # orders の各階数の微分 (0 はエネルギー) について三角基底に対する係数を返す
+    terms = _model_terms(model)
+    return [_coefficient_function(terms, n)(alpha, gamma, b_x, b_y, k_ext) for n in orders]
+
+
+def trig_basis(theta):
+    # sin, cos を1回ずつ評価し、2倍角は倍角公式で求める
+    s1 = np.sin(theta)
+    c1 = np.cos(theta)
+    return c1, s1, c1*c1 - s1*s1, 2*s1*c1
+
+
+def combine(coef, basis):
+    c1, s1, c2, s2 = basis
+    return coef[0] + coef[1]*c1 + coef[2]*s1 + coef[3]*c2 + coef[4]*s2
+
+
+def evaluate(table, theta, basis=None):
+    # coefficients で求めておいた係数を theta で評価する (係数を使い回す反復計算用)
+    if basis is None:
+        basis = trig_basis(theta)
+    return tuple(combine(coef, basis) for coef in table)
+
+
+def local_minima(theta, alpha, gamma, b_y, b_x=0.0, model='new', k_ext=4.0,
+        basis=None, tol=1.0e-12, max_iter=20):
+    # theta の格子上で勾配が負から正に変わる区間を探し、その中でニュートン法により極小点を求める
+    g_coef, h_coef = coefficients(alpha, gamma, b_y, b_x, model, k_ext, orders=(1, 2))
+    if basis is None:
+        basis = trig_basis(theta)
+    g = combine(g_coef, basis)
+    idx = np.nonzero((g[:-1] < 0) & (g[1:] >= 0))[0]
+    lower = theta[idx]
+    upper = theta[idx+1]
+    x = lower - g[idx] * (upper - lower) / (g[idx+1] - g[idx])
+
+    for i in range(max_iter):
+        x_basis = trig_basis(x)
+        delta = combine(g_coef, x_basis) / combine(h_coef, x_basis)
+        x = np.clip(x - delta, lower, upper)
+        if np.all(np.abs(delta) < tol): break
+
+    return x
+
+
+def derivatives(theta, alpha, gamma, b_y, b_x=0.0, model='new', k_ext=4.0, order=2):
+    # エネルギーと theta による微分を order 階まで同じ三角関数値から計算する
+    table = coefficients(alpha, gamma, b_y, b_x, model, k_ext, orders=range(order+1))
+    return evaluate(table, theta)
+
+
+def energy(theta, alpha, gamma, b_y, b_x=0.0, model='new', k_ext=4.0):
+    coef, = coefficients(alpha, gamma, b_y, b_x, model, k_ext, orders=(0,))
+    return combine(coef, trig_basis(theta))
+
+
+def grad(theta, alpha, gamma, b_y, b_x=0.0, model='new', k_ext=4.0):
+    coef, = coefficients(alpha, gamma, b_y, b_x, model, k_ext, orders=(1,))
+    return combine(coef, trig_basis(theta))
+
+
+def hess(theta, alpha, gamma, b_y, b_x=0.0, model='new', k_ext=4.0):
+    coef, = coefficients(alpha, gamma, b_y, b_x, model, k_ext, orders=(2,))
+    return combine(coef, trig_basis(theta))
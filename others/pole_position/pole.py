@@ -1,37 +1,29 @@
 #!/usr/bin/env python3
 
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider, Button
 
-def potentialEnergy(alpha, gamma, x, f_ext):
-
-    energy = 3 - 13*gamma/alpha
-    energy += (gamma/(2*alpha) - 1)*np.cos(2*x)
-    energy += (15*np.sqrt(3)*gamma/(2*alpha))*np.sin(2*x)
-    energy += f_ext*(-(2*alpha+5*gamma)*np.cos(x) + 3*np.sqrt(3)*gamma*np.sin(x))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import energy_model
 
-    return energy
+# 旧来のスクリプトと同じく外部磁場との直接の結合係数は 2*alpha
+def potentialEnergy(alpha, gamma, x, f_ext):
+    return energy_model.energy(x, alpha, gamma, f_ext, model='new', k_ext=2.0)
 
 def calcgrad(alpha, gamma, x, f_ext):
-    grad = (2 - gamma/alpha) * np.sin(2*x)
-    grad += (15*np.sqrt(3)*gamma/alpha) * np.cos(2*x)
-    grad += f_ext * ((2*alpha + 5*gamma)*np.sin(x) + 3*np.sqrt(3)*gamma*np.cos(x))
-
-    return grad
-
-def calcgradgrad(alpha, gamma, x, f_ext):
-    gradgrad = (4 - 2*gamma/alpha)*np.cos(2*x)
-    gradgrad -= (30*np.sqrt(3)*gamma/alpha) * np.sin(2*x)
-    gradgrad += f_ext * ( (2*alpha + 5*gamma)*np.cos(x) -3*np.sqrt(3)*gamma*np.sin(x))
-
-    return gradgrad
+    return energy_model.grad(x, alpha, gamma, f_ext, model='new', k_ext=2.0)
 
 
 def NewtonMethod(x0, alpha, gamma, f_ext):
+    #係数は x によらないので反復の前に一度だけ求める
+    table = energy_model.coefficients(alpha, gamma, 1, model='new', k_ext=2.0, orders=(1, 2))
     x = x0
     while(True):
-        delta = 0.1*calcgrad(alpha, gamma, x, 1)/calcgradgrad(alpha, gamma, x, 1)
+        grad, gradgrad = energy_model.evaluate(table, x)
+        delta = 0.1*grad/gradgrad
         if(abs(delta) < 1.0e-4):
             break
         #ax.plot(x, potentialEnergy(alpha, gamma, x, 1), marker='.', markersize=6)
@@ -1,32 +1,61 @@
 #!/usr/bin/env python3
 
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider, Button
 
-def potentialEnergy(alpha, gamma, x, f_ext):
-
-    energy = 3 - 13*gamma/alpha
-    energy += (gamma/(2*alpha) - 1)*np.cos(2*x)
-    energy += (15*np.sqrt(3)*gamma/(2*alpha))*np.sin(2*x)
-    energy += f_ext*(-(2*alpha+5*gamma)*np.cos(x) + 3*np.sqrt(3)*gamma*np.sin(x))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import energy_model
 
-    return energy
+# 旧来のスクリプトと同じく外部磁場との直接の結合係数は 2*alpha
+def potentialEnergy(alpha, gamma, x, f_ext):
+    return energy_model.energy(x, alpha, gamma, f_ext, model='new', k_ext=2.0)
 
 def grad(alpha, gamma, x, f_ext):
-    grad = (2 - gamma/alpha) * np.sin(2*x)
-    grad += (15*np.sqrt(3)*gamma/alpha) * np.cos(2*x)
-    grad += f_ext * ((2*alpha + 5*gamma)*np.sin(x) + 3*np.sqrt(3)*gamma*np.cos(x))
-
-    return grad
+    return energy_model.grad(x, alpha, gamma, f_ext, model='new', k_ext=2.0)
+
+# 三角関数の基底は theta の格子だけで決まるので一度だけ計算し、
+# スライダーの変更時は係数との積和だけでエネルギー曲線を更新する
+def landscape(alpha, gamma):
+    coef, = energy_model.coefficients(alpha, gamma, f_ext, model='new', k_ext=2.0, orders=(0,))
+    return energy_model.combine(coef, basis)
+
+def minima(alpha, gamma):
+    poles = []
+    for f in f_ext[:, 0]:
+        pole_x = energy_model.local_minima(x, alpha, gamma, f, model='new', k_ext=2.0, basis=basis)
+        poles.append((pole_x, potentialEnergy(alpha, gamma, pole_x, f)))
+    return poles
+
+def drawAnimated():
+    for artist in lines + pole_markers:
+        ax.draw_artist(artist)
+    for slider in (sli_alpha, sli_gamma):
+        fig.draw_artist(slider.ax)
+
+def onDraw(event):
+    global background
+    if fig.canvas.is_saving():
+        return
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    drawAnimated()
 
 def update(val):
     s_alpha = sli_alpha.val
     s_gamma = sli_gamma.val
-    l1.set_ydata( potentialEnergy(s_alpha, s_gamma, x, 1) )
-    l2.set_ydata( potentialEnergy(s_alpha, s_gamma, x, 0) )
-    l3.set_ydata( potentialEnergy(s_alpha, s_gamma, x, -1) )
-    fig.canvas.draw_idle()
+    for line, y in zip(lines, landscape(s_alpha, s_gamma)):
+        line.set_ydata(y)
+    for marker, (pole_x, pole_y) in zip(pole_markers, minima(s_alpha, s_gamma)):
+        marker.set_data(pole_x, pole_y)
+
+    if background is None:
+        fig.canvas.draw_idle()
+        return
+    fig.canvas.restore_region(background)
+    drawAnimated()
+    fig.canvas.blit(fig.bbox)
 
 def reset(event):
     sli_alpha.reset()
@@ -44,33 +73,41 @@ ax.set_xticklabels(['$-2\pi$', '$-\pi$', '0', '$\pi$', '$2\pi$',])
 plt.ylim(-1000, 1000)
 plt.grid()
 
-x = np.linspace(-2*np.pi, 2*np.pi, 100)
+x = np.linspace(-2*np.pi, 2*np.pi, 10001)
+basis = energy_model.trig_basis(x)
+f_ext = np.array([[1], [0], [-1]])
 alpha = 10
 gamma = 1
-d_alpha = 10
-d_gamma = 1
-y1 = potentialEnergy(alpha, gamma, x, 1)
-y2 = potentialEnergy(alpha, gamma, x, 0)
-y3 = potentialEnergy(alpha, gamma, x, -1)
-
-l1, = plt.plot(x, y1, lw=2, label='$B_{ext}=(0, 1, 0)$')
-l2, = plt.plot(x, y3, lw=2, label='$B_{ext}=(0, 0, 0)$')
-l3, = plt.plot(x, y2, lw=2, label='$B_{ext}=(0, -1, 0)$')
-plt.legend(fontsize=15)
+background = None
+
+labels = ['$B_{ext}=(0, 1, 0)$', '$B_{ext}=(0, 0, 0)$', '$B_{ext}=(0, -1, 0)$']
+lines = []
+pole_markers = []
+for i, y in enumerate(landscape(alpha, gamma)):
+    l, = plt.plot(x, y, lw=2, color='C{}'.format(i), label=labels[i], animated=True)
+    lines.append(l)
+for i, (pole_x, pole_y) in enumerate(minima(alpha, gamma)):
+    m, = plt.plot(pole_x, pole_y, ls='', marker='o', markersize=8, color='C{}'.format(i), animated=True)
+    pole_markers.append(m)
+plt.legend(handles=lines, fontsize=15)
 
 axcolor = 'gold'
 ax_alpha = plt.axes([0.25, 0.15, 0.65, 0.03], facecolor=axcolor)
 ax_gamma = plt.axes([0.25, 0.05, 0.65, 0.03], facecolor=axcolor)
 
-sli_alpha = Slider(ax_alpha, 'Alpha', 10, 100, valinit=alpha, valstep=d_alpha)
-sli_gamma = Slider(ax_gamma, 'Gamma', 1, 40, valinit=gamma, valstep=d_gamma)
+sli_alpha = Slider(ax_alpha, 'Alpha', 10, 100, valinit=alpha)
+sli_gamma = Slider(ax_gamma, 'Gamma', 1, 40, valinit=gamma)
 
-sli_alpha.on_changed(update)
-sli_gamma.on_changed(update)
+#スライダー自身の再描画は drawAnimated でまとめて行う
+for slider in (sli_alpha, sli_gamma):
+    slider.drawon = False
+    slider.ax.set_animated(True)
+    slider.on_changed(update)
 
 resetax = plt.axes([0.8, 0.0, 0.1, 0.04])
 button = Button(resetax, 'Reset', color=axcolor, hovercolor='0.975')
 
 button.on_clicked(reset)
+fig.canvas.mpl_connect('draw_event', onDraw)
 
 plt.show()
@@ -17,22 +17,26 @@ def external_field_pole(alpha, gamma):
     phi =  np.arctan(y_phi/x_phi)
     return -phi
 
-#alpha_arr = np.linspace(0.01, 100, 100)
-#gamma_arr = np.linspace(0.01, 300, 300)
+def main():
+    #alpha_arr = np.linspace(0.01, 100, 100)
+    #gamma_arr = np.linspace(0.01, 300, 300)
 
-alpha_arr = np.arange(1.0, 100, 1.0)
-gamma_arr = np.arange(1.0, 1000, 1.0)
+    alpha_arr = np.arange(1.0, 100, 1.0)
+    gamma_arr = np.arange(1.0, 1000, 1.0)
 
-alpha_arr, gamma_arr = np.meshgrid(alpha_arr, gamma_arr)
-diff = external_field_pole(alpha_arr, gamma_arr) - characteristic_pole(alpha_arr, gamma_arr)
+    alpha_arr, gamma_arr = np.meshgrid(alpha_arr, gamma_arr)
+    diff = external_field_pole(alpha_arr, gamma_arr) - characteristic_pole(alpha_arr, gamma_arr)
 
-fig, ax = plt.subplots(1, 1)
-ax.set_title('external pole - static pole')
-ax.set_xlabel('$\\alpha$', fontsize=15)
-ax.set_ylabel('$\\gamma$', fontsize=15)
-mappable = ax.pcolor(alpha_arr, gamma_arr, diff, cmap="coolwarm", norm=Normalize(vmin=-0.01, vmax=0.01))
-pp = fig.colorbar(mappable, ax=ax, orientation='vertical')
-fig.tight_layout()
+    fig, ax = plt.subplots(1, 1)
+    ax.set_title('external pole - static pole')
+    ax.set_xlabel('$\\alpha$', fontsize=15)
+    ax.set_ylabel('$\\gamma$', fontsize=15)
+    mappable = ax.pcolor(alpha_arr, gamma_arr, diff, cmap="coolwarm", norm=Normalize(vmin=-0.01, vmax=0.01))
+    pp = fig.colorbar(mappable, ax=ax, orientation='vertical')
+    fig.tight_layout()
 
-plt.show()
+    plt.show()
 
+
+if __name__ == '__main__':
+    main()
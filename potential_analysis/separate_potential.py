@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+import os
+import sys
 import numpy as np
 from tqdm import tqdm
 import matplotlib
@@ -6,6 +8,9 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import energy_model
+
 
 d_time = 1.0e-2
 omega = 2*np.pi
@@ -21,30 +26,19 @@ gamma = 1.0e-0
 a_l = 0.3
 
 def all_energy(theta, ext_field):
-    energy = 0
-    energy += u_ext(theta, ext_field)
-    energy += u_dd(theta)
-    energy += u_ext_p(theta, ext_field)
-    energy += u_dd_p(theta)
-    return energy
+    return energy_model.energy(theta, alpha, gamma, ext_field, model='new')
 
 def u_ext(theta, ext_field):
-    moment = np.array([-np.sin(theta), np.cos(theta)]).T
-    b_ext = np.array([0, ext_field])
-    return -4 * alpha * np.dot(moment, b_ext)
+    return energy_model.energy(theta, alpha, gamma, ext_field, model=('ext',))
 
 def u_dd(theta):
-    return 3 - np.cos(2*theta)
+    return energy_model.energy(theta, alpha, gamma, 0, model=('dd',))
 
 def u_ext_p(theta, ext_field):
-    moment = np.array([-np.sin(theta), np.cos(theta)]).T
-    arr = np.array([3*np.sqrt(3), 5])
-    return -gamma * ext_field * np.dot(moment, arr)
+    return energy_model.energy(theta, alpha, gamma, ext_field, model=('ext_p',))
 
 def u_dd_p(theta):
-    moment = np.array([-np.sin(theta), np.cos(theta)]).T
-    arr = np.array([3*np.sqrt(3), 5])
-    return gamma / alpha * (3*np.sqrt(3)*np.sin(theta - np.pi/3) + 2*np.cos(theta)) * np.dot(moment, arr)
+    return energy_model.energy(theta, alpha, gamma, 0, model=('dd_p',))
 
 def characteristic_pole():
     x_psi = alpha + 2*gamma
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from external_magnetic_field import ExternalMagneticField
+from swimmer import Swimmer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'potential_analysis'))
+import energy_model
+from pole_position import characteristic_pole, external_field_pole
+
+# 回転磁場中のスイマーの角度 theta(t) を、高精度の参照解 (reference/*.npz) と比較する。
+#   euler      : main.py と同じ Swimmer による陽的オイラー法
+#   batch      : euler と同じ式のトルクを numpy 配列で書き、CASES の全ケースを1つの配列として進めるオイラー法
+#                (時間は全ケース分の合計)
+#   gradient   : torque = -dU/dtheta / 4 として energy_model の勾配で進めるオイラー法
+#                (トルクの整合性検査に通ったモデルだけ)
+#   gradient32 : gradient を float32 で計算したもの
+#   rk45       : Swimmer のトルクを右辺とする適応刻み RK45
+# 各設定の誤差と計算コストを表示し、--target を満たす最も速い設定を選ぶ。
+
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference')
+REFERENCE_RTOL = 1.0e-12
+
+CASES = {
+    'old': {'flag': False, 'theta0': 0.0, 'omega': 2*np.pi, 't_end': 2.0, 'num_sample': 401},
+    'new': {'flag': True, 'theta0': 0.0, 'omega': 2*np.pi, 't_end': 2.0, 'num_sample': 401},
+}
+
+EULER_D_TIME = [1.0e-3, 3.0e-4, 1.0e-4, 3.0e-5]
+RK45_RTOL = [1.0e-3, 1.0e-5, 1.0e-7]
+
+# 旧モデルでのトルクとエネルギー勾配の比
+TORQUE_PER_GRAD = -0.25
+
+# 整合性検査の許容誤差
+CONSISTENCY_TOL = 1.0e-9
+# 現在のコードで分かっている食い違い (検査名: 最大誤差の上限)。
+# 最大誤差が上限を超えたときだけ失敗とする (現在の値は 3.25e-1 と 8.13e-2)。
+#   torque_new          : 新モデルの Swimmer のトルクは新モデルのエネルギーの勾配になっていない
+#   characteristic_pole : pole_position.characteristic_pole は dd+dd_p の極小点と一致しない
+KNOWN_DISCREPANCIES = {
+    'torque_new': 0.33,
+    'characteristic_pole': 0.09,
+}
+
+
+def main():
+    args = parseArguments()
+    failed = False
+    #sympy からの関数生成を計測時間に含めないように先に済ませておく
+    for model in energy_model.MODELS:
+        energy_model.coefficients(Swimmer.alpha, Swimmer.gamma, 0.0, model=model)
+
+    print('[consistency]')
+    torque_ok, gradient_models = checkTorque()
+    failed |= not torque_ok
+    failed |= not checkPoles()
+
+    for name, case in CASES.items():
+        if args.update_reference:
+            print('Computing reference for {} ...'.format(name))
+            saveReference(name, case)
+        t_sample, theta_ref = loadReference(name, case)
+
+        print('\n[{}] flag={} theta0={} t_end={}'.format(name, case['flag'], case['theta0'], case['t_end']))
+        print('{:<12}{:>12}{:>14}{:>12}{:>10}{:>8}  {}'.format(
+            'path', 'setting', 'max error', 'time [s]', 'nfev', 'order', 'target'))
+        results = []
+        prev = None
+        model = 'new' if case['flag'] else 'old'
+        if model not in gradient_models:
+            print('(gradient paths skipped: torque is not -dU/dtheta/4 for the {} model)'.format(model))
+        for path, setting, run in fastPaths(case, model in gradient_models):
+            start = time.perf_counter()
+            theta, nfev = run(t_sample)
+            elapsed = time.perf_counter() - start
+            error = np.max(np.abs(theta - theta_ref))
+            order = ''
+            if prev is not None and prev[0] == path and path != 'rk45' and error > 0:
+                order = '{:.2f}'.format(np.log(prev[2]/error) / np.log(prev[1]/setting))
+            ok = error <= args.target
+            print('{:<12}{:>12.1e}{:>14.3e}{:>12.3f}{:>10d}{:>8}  {}'.format(
+                path, setting, error, elapsed, nfev, order, 'ok' if ok else '-'))
+            results.append((elapsed, path, setting, ok))
+            prev = (path, setting, error)
+
+        passed = [r for r in results if r[3]]
+        if passed:
+            elapsed, path, setting, _ = min(passed)
+            print('cheapest within {:.1e}: {} {:.1e} ({:.3f} s)'.format(args.target, path, setting, elapsed))
+        else:
+            print('no configuration within {:.1e}'.format(args.target))
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target', type=float, default=1.0e-3,
+            help='accuracy target for max |theta - theta_ref| (default: 1e-3)')
+    parser.add_argument('--update-reference', action='store_true',
+            help='recompute the reference trajectories and overwrite reference/*.npz')
+    return parser.parse_args()
+
+
+def angularVelocity(swimmer, theta, psi):
+    probe = Swimmer(swimmer.pos, theta, flag=swimmer.flag)
+    b_ext = ExternalMagneticField(angle=psi).moment
+    probe.calcParamagneticMoment(b_ext)
+    probe.calcTorque(b_ext)
+    return probe.angularVelocity()
+
+
+def solveSwimmer(case, t_sample, method, rtol, atol):
+    swimmer = Swimmer(np.zeros(3), case['theta0'], flag=case['flag'])
+    rhs = lambda t, y: [angularVelocity(swimmer, y[0], case['omega']*t)]
+    sol = solve_ivp(rhs, (0, case['t_end']), [case['theta0']], method=method,
+            rtol=rtol, atol=atol, t_eval=t_sample)
+    if not sol.success:
+        raise RuntimeError(sol.message)
+    return sol.y[0], sol.nfev
+
+
+def saveReference(name, case):
+    t_sample = np.linspace(0, case['t_end'], case['num_sample'])
+    theta, nfev = solveSwimmer(case, t_sample, 'DOP853', REFERENCE_RTOL, REFERENCE_RTOL)
+    os.makedirs(REFERENCE_DIR, exist_ok=True)
+    np.savez(os.path.join(REFERENCE_DIR, name + '.npz'), t=t_sample, theta=theta,
+            rtol=REFERENCE_RTOL, alpha=Swimmer.alpha, beta=Swimmer.beta, gamma=Swimmer.gamma,
+            a_l=Swimmer.a_l, **case)
+
+
+def loadReference(name, case):
+    path = os.path.join(REFERENCE_DIR, name + '.npz')
+    with np.load(path) as data:
+        params = dict(case, alpha=Swimmer.alpha, beta=Swimmer.beta, gamma=Swimmer.gamma, a_l=Swimmer.a_l)
+        for k, v in params.items():
+            if not np.array_equal(data[k], v):
+                raise ValueError('{} was computed with {}={}, not {}; rerun with --update-reference'.format(
+                    path, k, data[k], v))
+        return data['t'], data['theta']
+
+
+def fastPaths(case, use_gradient):
+    for d_time in EULER_D_TIME:
+        yield 'euler', d_time, lambda t, d_time=d_time: euler(case, t, d_time)
+    for d_time in EULER_D_TIME:
+        yield 'batch', d_time, lambda t, d_time=d_time: batchEuler(case, t, d_time)
+    if use_gradient:
+        for d_time in EULER_D_TIME:
+            yield 'gradient', d_time, lambda t, d_time=d_time: gradientEuler(case, t, d_time, np.float64)
+        for d_time in EULER_D_TIME:
+            yield 'gradient32', d_time, lambda t, d_time=d_time: gradientEuler(case, t, d_time, np.float32)
+    for rtol in RK45_RTOL:
+        yield 'rk45', rtol, lambda t, rtol=rtol: solveSwimmer(case, t, 'RK45', rtol, rtol*1.0e-3)
+
+
+#オイラー法の theta は1ステップの間で線形なので、サンプル時刻の値は線形補間で正確に求まる
+def sampleSteps(theta_steps, d_time, t_sample):
+    t_steps = d_time * np.arange(len(theta_steps))
+    return np.interp(t_sample, t_steps, theta_steps)
+
+
+def euler(case, t_sample, d_time):
+    swimmer = Swimmer(np.zeros(3), case['theta0'], flag=case['flag'])
+    magnetic_field = ExternalMagneticField(angle=0, angle_velocity=case['omega'])
+    num_step = int(np.ceil(case['t_end'] / d_time))
+    theta = np.empty(num_step+1)
+    theta[0] = swimmer.theta
+    for i in range(num_step):
+        swimmer.calcParamagneticMoment(magnetic_field.moment)
+        swimmer.calcTorque(magnetic_field.moment)
+        swimmer.update(d_time)
+        magnetic_field.update(d_time)
+        theta[i+1] = swimmer.theta
+    return sampleSteps(theta, d_time, t_sample), num_step
+
+
+#Swimmer.calcParamagneticMoment と calcTorque を theta の配列について計算したトルクの z 成分
+#外部磁場は y 成分 b_y だけ、flag は新モデルで 1, 旧モデルで 0
+def batchTorque(theta, b_y, flag):
+    m_x, m_y = -np.sin(theta), np.cos(theta)
+    o_x, o_y = -m_x, m_y
+    n_x, n_y = np.cos(np.pi/3), np.sin(np.pi/3)
+    n2_x, n2_y = -np.cos(np.pi/3), np.sin(np.pi/3)
+
+    dot_m = m_x*n_x + m_y*n_y
+    dot_o = o_x*n2_x + o_y*n2_y
+    b_p_x = 3*dot_m*n_x - m_x + 3*dot_o*n2_x - o_x
+    b_p_y = 3*dot_m*n_y - m_y + 3*dot_o*n2_y - o_y
+    p_x = Swimmer.gamma * flag*b_p_x/Swimmer.alpha
+    p_y = Swimmer.gamma * (b_y + flag*b_p_y/Swimmer.alpha)
+
+    dot_p = p_x*n_x + p_y*n_y
+    b_all_x = 3*o_x - o_x + 3*dot_p*n_x - p_x
+    b_all_y = Swimmer.alpha*b_y - o_y + 3*dot_p*n_y - p_y
+    return m_x*b_all_y - m_y*b_all_x
+
+
+def batchEuler(case, t_sample, d_time):
+    cases = list(CASES.values())
+    theta = np.array([c['theta0'] for c in cases], dtype=float)
+    omega = np.array([c['omega'] for c in cases], dtype=float)
+    flag = np.array([c['flag'] for c in cases], dtype=float)
+    mobility = Swimmer.beta * (1/(Swimmer.a_l**3) + 1/2)
+    num_step = int(np.ceil(case['t_end'] / d_time))
+
+    theta_steps = np.empty((num_step+1, len(cases)))
+    theta_steps[0] = theta
+    psi = np.zeros(len(cases))
+    for i in range(num_step):
+        theta = theta + mobility*batchTorque(theta, np.cos(psi), flag) * d_time
+        psi = psi + omega*d_time
+        theta_steps[i+1] = theta
+    k = cases.index(case)
+    return sampleSteps(theta_steps[:, k], d_time, t_sample), num_step
+
+
+def gradientEuler(case, t_sample, d_time, dtype):
+    mobility = dtype(TORQUE_PER_GRAD * Swimmer.beta * (1/(Swimmer.a_l**3) + 1/2))
+    model = 'new' if case['flag'] else 'old'
+    num_step = int(np.ceil(case['t_end'] / d_time))
+    b_y = np.cos(case['omega'] * d_time * np.arange(num_step))
+    table, = energy_model.coefficients(Swimmer.alpha, Swimmer.gamma, b_y, model=model, orders=(1,))
+    #係数は時刻だけで決まるので全ステップ分をまとめて計算しておく
+    coef = np.array([np.broadcast_to(c, b_y.shape) for c in table], dtype=dtype)
+
+    theta = np.empty(num_step+1, dtype=dtype)
+    theta[0] = case['theta0']
+    step = dtype(d_time) * mobility
+    for i in range(num_step):
+        basis = energy_model.trig_basis(theta[i])
+        theta[i+1] = theta[i] + step * energy_model.combine(coef[:, i], basis)
+    return sampleSteps(theta.astype(np.float64), d_time, t_sample), num_step
+
+
+def consistencyStatus(name, worst):
+    bound = KNOWN_DISCREPANCIES.get(name)
+    if worst < CONSISTENCY_TOL:
+        if bound is not None:
+            return True, 'ok (fixed; remove {} from KNOWN_DISCREPANCIES)'.format(name)
+        return True, 'ok'
+    if bound is not None and worst <= bound:
+        return True, 'known discrepancy (<= {:g})'.format(bound)
+    return False, 'MISMATCH'
+
+
+#トルクが -dU/dtheta/4 と一致するモデルの一覧も返す
+def checkTorque():
+    ok = True
+    gradient_models = []
+    theta = np.linspace(-np.pi, np.pi, 37)
+    for flag in (False, True):
+        swimmer = Swimmer(np.zeros(3), 0.0, flag=flag)
+        worst = 0.0
+        for b_y in (-1.0, -0.3, 0.0, 0.5, 1.0):
+            b_ext = np.array([0, b_y, 0])
+            grad = energy_model.grad(theta, Swimmer.alpha, Swimmer.gamma, b_y, model=swimmer.energyModel())
+            for x, g in zip(theta, grad):
+                probe = Swimmer(swimmer.pos, x, flag=flag)
+                probe.calcParamagneticMoment(b_ext)
+                probe.calcTorque(b_ext)
+                worst = max(worst, abs(probe.torque[2] - TORQUE_PER_GRAD*g))
+        if worst < CONSISTENCY_TOL:
+            gradient_models.append(swimmer.energyModel())
+        passed, status = consistencyStatus('torque_' + swimmer.energyModel(), worst)
+        ok &= passed
+        print('torque == -dU/dtheta/4 ({} model): max diff {:.6e}  {}'.format(
+            swimmer.energyModel(), worst, status))
+    return ok, gradient_models
+
+
+def checkPoles():
+    alpha, gamma = np.meshgrid(np.linspace(10, 100, 10), np.linspace(1, 40, 14))
+    theta = np.linspace(-np.pi/2, np.pi/2, 2001)
+    checks = [
+        ('external_field_pole', external_field_pole, 1.0, ('ext', 'ext_p')),
+        ('characteristic_pole', characteristic_pole, 0.0, ('dd', 'dd_p')),
+        ]
+    ok = True
+    for name, pole, b_y, terms in checks:
+        worst = 0.0
+        for a, g in zip(alpha.ravel(), gamma.ravel()):
+            minima = energy_model.local_minima(theta, a, g, b_y, model=terms)
+            worst = max(worst, np.min(np.abs(minima - pole(a, g))))
+        passed, status = consistencyStatus(name, worst)
+        ok &= passed
+        print('{} == minimum of {}: max diff {:.6e}  {}'.format(
+            name, '+'.join(terms), worst, status))
+    return ok
+
+
+if __name__ == '__main__':
+    main()
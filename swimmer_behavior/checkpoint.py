@@ -0,0 +1,65 @@
+import os
+import numpy as np
+
+# 長時間計算の途中状態を保存・復元する
+#   path        : ステップ数, スイマー・外部磁場・出力スケジューラの状態, 計算条件 (npz)
+#   path.frames : 出力フレームの生データ (float64 の追記専用ファイル)
+# フレームは前回保存以降の分だけを追記するので、保存のコストは計算の長さに依存しない。
+class Checkpoint:
+    def __init__(self, path, config):
+        self.path = path
+        self.frame_path = path + '.frames'
+        self.config = config
+        self.num_saved_frames = 0
+
+    def exists(self):
+        return os.path.exists(self.path) or os.path.exists(self.frame_path)
+
+    def clear(self):
+        for p in (self.path, self.frame_path):
+            if os.path.exists(p):
+                os.remove(p)
+        self.num_saved_frames = 0
+
+    def save(self, step, pole_x, swimmer, magnetic_field, scheduler, frames):
+        new_frames = frames[self.num_saved_frames:]
+        if len(new_frames) > 0:
+            with open(self.frame_path, 'ab') as f:
+                np.asarray(new_frames, dtype=np.float64).tofile(f)
+        self.num_saved_frames = len(frames)
+
+        state = {'step': step, 'pole_x': pole_x, 'num_frames': len(frames)}
+        state.update({'config_' + k: v for k, v in self.config.items()})
+        state.update({'swimmer_' + k: v for k, v in swimmer.getState().items()})
+        state.update({'field_' + k: v for k, v in magnetic_field.getState().items()})
+        state.update({'scheduler_' + k: v for k, v in scheduler.getState().items()})
+
+        #書き込み途中で落ちても前回のチェックポイントが壊れないように置き換える
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **state)
+        os.replace(tmp_path, self.path)
+
+    def load(self, swimmer, magnetic_field, scheduler, frame_size):
+        with np.load(self.path) as data:
+            state = {k: data[k] for k in data.files}
+
+        for k, v in self.config.items():
+            saved = state.get('config_' + k)
+            if saved is None or not np.array_equal(saved, v):
+                raise ValueError('checkpoint {} was written with {}={}, not {}'.format(
+                    self.path, k, saved, v))
+
+        swimmer.setState({k[len('swimmer_'):]: v for k, v in state.items() if k.startswith('swimmer_')})
+        magnetic_field.setState({k[len('field_'):]: v for k, v in state.items() if k.startswith('field_')})
+        scheduler.setState({k[len('scheduler_'):]: v for k, v in state.items() if k.startswith('scheduler_')})
+
+        #状態ファイルより後に追記されたフレームは捨てる
+        num_frames = int(state['num_frames'])
+        frames = np.fromfile(self.frame_path, dtype=np.float64) if num_frames > 0 else np.zeros(0)
+        frames = frames[:num_frames*frame_size].reshape(num_frames, frame_size)
+        with open(self.frame_path, 'ab') as f:
+            f.truncate(frames.nbytes)
+        self.num_saved_frames = num_frames
+
+        return int(state['step']), float(state['pole_x']), list(frames)
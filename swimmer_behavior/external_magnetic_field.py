@@ -9,3 +9,11 @@ class ExternalMagneticField:
     def update(self, dt):
         self.psi += self.omega * dt
         self.moment = np.array([0, np.cos(self.psi), 0])
+
+    def getState(self):
+        return {'psi': self.psi, 'moment': self.moment, 'omega': self.omega}
+
+    def setState(self, state):
+        self.psi = float(state['psi'])
+        self.moment = np.array(state['moment'])
+        self.omega = float(state['omega'])
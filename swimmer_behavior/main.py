@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+import argparse
+import sys
 import numpy as np
 from tqdm import tqdm
 import matplotlib
@@ -10,17 +12,32 @@ import matplotlib.patches as patches
 
 from external_magnetic_field import ExternalMagneticField
 from swimmer import Swimmer
+from checkpoint import Checkpoint
+from output_scheduler import OutputScheduler
+
+# 1フレームの記録: [time, theta, pole_x, b_ext(3), positions(3x3), moments(3x3)]
+# 極小点を追跡できていないフレームの pole_x は nan
+FRAME_SIZE = 24
+
+D_TIME = 1.0e-4
 
 def main():
+    args = parseArguments()
     FLAG = False # True=NewModel, False=OldModel
 
-    d_time = 1.0e-4
+    d_time = D_TIME
     omega = 2*np.pi
     num_cycle = 4
     max_iter = num_cycle / d_time
-    out_time = 1.0e-2
+    out_time = 5.0e-2
     out_iter = int(out_time / d_time)
+    #角速度 |dtheta/dt| と極小点からのずれ |theta - pole_x| がまたいだら追加で出力する値
+    speed_levels = [1.0, 5.0, 20.0]
+    lag_levels = [0.5]
+    #極小点の追跡で1ステップに動かす最大の角度
+    pole_step = 0.1
     sleep_iter = int(1 / d_time)
+    checkpoint_iter = int(args.checkpoint_time / d_time)
 
     fig, axes = plt.subplots(2, 1, figsize=(10, 8))
     matplotlibSetting(fig, axes, FLAG)
@@ -30,14 +47,30 @@ def main():
     
     swimmer = Swimmer(init_position, 0, flag=FLAG)
     magnetic_field = ExternalMagneticField(angle=0, angle_velocity=omega)
+    scheduler = OutputScheduler(out_iter, [speed_levels, lag_levels], periodic=[2])
+    checkpoint = Checkpoint(args.checkpoint, {
+        'flag': FLAG, 'd_time': d_time, 'omega': omega,
+        'num_cycle': num_cycle, 'out_iter': out_iter,
+        'speed_levels': speed_levels, 'lag_levels': lag_levels, 'pole_step': pole_step,
+        })
 
-    print('Aligning particles ...')
-    
-    for i in range(int(sleep_iter)):
-        swimmer.calcParamagneticMoment(magnetic_field.moment)
-        swimmer.calcTorque(magnetic_field.moment)
-        swimmer.update(d_time)
-        #magnetic_field.update(d_time)
+    if args.resume:
+        print('Resuming from {} ...'.format(args.checkpoint))
+        start_iter, pole_x, frames = checkpoint.load(swimmer, magnetic_field, scheduler, FRAME_SIZE)
+    else:
+        #再投入したジョブが途中結果を消してしまわないように、既存のチェックポイントは明示的に上書きさせる
+        if checkpoint.exists() and not args.overwrite:
+            sys.exit('{} already exists; use --resume to continue it or --overwrite to start over'.format(
+                args.checkpoint))
+        checkpoint.clear()
+        print('Aligning particles ...')
+        
+        for i in range(int(sleep_iter)):
+            swimmer.calcParamagneticMoment(magnetic_field.moment)
+            swimmer.calcTorque(magnetic_field.moment)
+            swimmer.update(d_time)
+            #magnetic_field.update(d_time)
+        start_iter, pole_x, frames = 0, swimmer.theta, []
     
     if FLAG == False:
         #theta_arr = np.linspace(-2*np.pi, num_cycle*2*np.pi, 100*(1+int(num_cycle)))
@@ -45,9 +78,8 @@ def main():
     elif FLAG == True:
         theta_arr = np.linspace(-num_cycle*2*np.pi - np.pi/2, 2*np.pi, 100*(1+int(num_cycle)))
     
-    pole_x = 0
     print('Start Iteration')
-    for i in tqdm(range(int(max_iter))):
+    for i in tqdm(range(start_iter, int(max_iter)), initial=start_iter, total=int(max_iter)):
     #for i in range(1):
         #mutableな外部地場のモーメントを変更しないため
         b_ext = magnetic_field.moment.copy()
@@ -55,40 +87,106 @@ def main():
     
         swimmer.calcParamagneticMoment(b_ext)
         swimmer.calcTorque(b_ext)
+        pole_x, tracked = swimmer.trackPole(pole_x, b_ext, pole_step)
         #####
-        if i%out_iter == 0:
-            #subplot (1, 1)
-            positions = swimmer.particlePosition()
-            moments = 0.5*swimmer.particleMoment()
-            im1_1 = axes[0].quiver(positions[0], positions[1], moments[0], moments[1], \
-                    color='black', angles='xy', scale_units='xy', scale=1, pivot='mid', width=5.0e-3, zorder=2)
-            im1_2 = axes[0].quiver(-2.0, -0.5, b_ext[0], b_ext[1], \
-                    color='black', angles='xy', scale_units='xy', scale=2, width=5.0e-3, zorder=2)
-    
-            #subplot (2, 1)
-            potential, potential_arr = swimmer.potentialEnergy(theta_arr, b_ext)
-            im2_1 = axes[1].plot(theta_arr, potential_arr, c='C0')
-    
-            im2_1 += axes[1].plot(swimmer.theta, potential, marker='.', markersize=10, color='r')
-            pole_x = swimmer.gradientDescent(pole_x, b_ext)
-            _, pole_potential = swimmer.potentialEnergy(pole_x, b_ext)
-            #im2_1 += axes[1].plot(pole_x, pole_potential, marker='.', markersize=10, color='g')
-            im2_2 = axes[1].axvline(swimmer.theta, color='r')
-
-            ims.append([im1_1]+[im1_2]+im2_1+[im2_2])
+        #極小点が消えている間は極小点とのずれを補間せず、消えたステップを1つの出力とする
+        state = [swimmer.theta, magnetic_field.psi, pole_x]
+        events = scheduler.findEvents(state, observe(swimmer, pole_x),
+                lambda st: observe(probeSwimmer(swimmer, st)[0], st[2]), valid=[True, tracked])
+        for s, st in events:
+            probe, probe_b_ext = probeSwimmer(swimmer, st)
+            frames.append(frameRecord((i-1+s)*d_time, probe, probe_b_ext, st[2] if tracked else np.nan))
+        if scheduler.isCoarseStep(i):
+            frames.append(frameRecord(i*d_time, swimmer, b_ext, pole_x if tracked else np.nan))
     
         #####
         swimmer.update(d_time)
         magnetic_field.update(d_time)
+
+        if (i+1)%checkpoint_iter == 0:
+            checkpoint.save(i+1, pole_x, swimmer, magnetic_field, scheduler, frames)
+    checkpoint.save(int(max_iter), pole_x, swimmer, magnetic_field, scheduler, frames)
     
     #print("final particle angle: {}".format(swimmer.theta))
     #print("pole angle          : {}".format(pole_x))
-    ani = animation.ArtistAnimation(fig, ims, interval=(out_time*1.0e+3*5))
+    for frame in frames:
+        ims.append(frameArtists(axes, swimmer, theta_arr, frame))
+    #出力時刻は等間隔ではないので、1フレームの表示時間は固定する
+    ani = animation.ArtistAnimation(fig, ims, interval=50)
     print('Saving animation ...')
     ani.save('sample.mp4', writer='ffmpeg')
     print('Success!')
 
 
+def parseArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resume', action='store_true',
+            help='continue the run stored in the checkpoint file')
+    parser.add_argument('--overwrite', action='store_true',
+            help='start a new run even if the checkpoint file exists')
+    parser.add_argument('--checkpoint', default='checkpoint.npz',
+            help='checkpoint file (default: checkpoint.npz)')
+    parser.add_argument('--checkpoint-time', type=float, default=1.0,
+            help='simulation time between checkpoints, at least one time step {:g} (default: 1.0)'.format(D_TIME))
+    args = parser.parse_args()
+    #保存間隔が0ステップになると剰余が計算できない
+    if args.checkpoint_time < D_TIME:
+        parser.error('--checkpoint-time must be at least the time step {:g}'.format(D_TIME))
+    return args
+
+
+def observe(swimmer, pole_x):
+    lag = (swimmer.theta - pole_x + np.pi)%(2*np.pi) - np.pi
+    return [swimmer.angularVelocity(), lag]
+
+
+#前ステップと現ステップの間を補間した状態 [theta, psi, pole_x] のスイマーと外部磁場
+def probeSwimmer(swimmer, state):
+    theta, psi, pole_x = state
+    probe = Swimmer(swimmer.pos, theta, flag=swimmer.flag)
+    b_ext = ExternalMagneticField(angle=psi).moment
+    probe.calcParamagneticMoment(b_ext)
+    probe.calcTorque(b_ext)
+    return probe, b_ext
+
+
+def frameRecord(time, swimmer, b_ext, pole_x):
+    return np.concatenate([
+        [time, swimmer.theta, pole_x],
+        b_ext,
+        swimmer.particlePosition().ravel(),
+        swimmer.particleMoment().ravel(),
+        ])
+
+
+def frameArtists(axes, swimmer, theta_arr, frame):
+    theta = frame[1]
+    b_ext = frame[3:6]
+    positions = frame[6:15].reshape(3, 3)
+    moments = 0.5*frame[15:24].reshape(3, 3)
+
+    #subplot (1, 1)
+    im1_1 = axes[0].quiver(positions[0], positions[1], moments[0], moments[1], \
+            color='black', angles='xy', scale_units='xy', scale=1, pivot='mid', width=5.0e-3, zorder=2)
+    im1_2 = axes[0].quiver(-2.0, -0.5, b_ext[0], b_ext[1], \
+            color='black', angles='xy', scale_units='xy', scale=2, width=5.0e-3, zorder=2)
+
+    #subplot (2, 1)
+    _, potential_arr = swimmer.potentialEnergy(theta_arr, b_ext)
+    _, potential = swimmer.potentialEnergy(theta, b_ext)
+    im2_1 = axes[1].plot(theta_arr, potential_arr, c='C0')
+
+    im2_1 += axes[1].plot(theta, potential, marker='.', markersize=10, color='r')
+    #追跡している極小点 (見失ったフレームでは描かない)
+    pole_x = frame[2]
+    if not np.isnan(pole_x):
+        _, pole_potential = swimmer.potentialEnergy(pole_x, b_ext)
+        im2_1 += axes[1].plot(pole_x, pole_potential, marker='.', markersize=10, color='g')
+    im2_2 = axes[1].axvline(theta, color='r')
+
+    return [im1_1]+[im1_2]+im2_1+[im2_2]
+
+
 def matplotlibSetting(fig, axes, flag):
     axes[0].set_xlabel('$x/l$', fontsize=15)
     axes[0].set_ylabel('$y/l$', fontsize=15)
@@ -0,0 +1,78 @@
+import numpy as np
+from scipy.optimize import brentq
+
+# 出力フレームの時刻を決める
+#   out_iter ステップごとの粗い出力に加えて、観測量 (角速度, 極小点とのずれ など) の絶対値が
+#   levels のいずれかをまたいだステップでは、前ステップとの間を線形補間した状態の上で
+#   brentq によりまたいだ時刻を求め、その時刻の状態を出力する。
+#   観測量が定義されていないステップ (valid=False) をまたいでは補間せず、
+#   定義されなくなったステップ自体を1つの出力とする。
+#   periodic に含まれる状態量は角度として短い方の弧に沿って補間する。
+class OutputScheduler:
+    def __init__(self, out_iter, levels, periodic=(), xtol=1.0e-12):
+        self.out_iter = out_iter
+        self.levels = [np.asarray(l, dtype=float) for l in levels]
+        self.periodic = list(periodic)
+        self.xtol = xtol
+        self.prev_state = None
+        self.prev_obs = None
+        self.prev_valid = None
+
+    def isCoarseStep(self, i):
+        return i%self.out_iter == 0
+
+    def interpolate(self, s, state):
+        #s=1 で現ステップの状態と厳密に一致させる
+        prev = self.prev_state.copy()
+        for k in self.periodic:
+            prev[k] = state[k] - ((state[k] - prev[k] + np.pi)%(2*np.pi) - np.pi)
+        return (1 - s)*prev + s*state
+
+    def findEvents(self, state, obs, observe, valid=None):
+        # state: 補間する状態量, obs: state での観測量, observe: 状態量 -> 観測量
+        # valid: 観測量ごとに state で定義されているか
+        state = np.asarray(state, dtype=float)
+        obs = np.asarray(obs, dtype=float)
+        valid = np.ones(len(obs), dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+        events = []
+        if self.prev_obs is not None:
+            for k, levels in enumerate(self.levels):
+                if self.prev_valid[k] and not valid[k]:
+                    events.append(1.0)
+                if not (self.prev_valid[k] and valid[k]):
+                    continue
+                a = abs(self.prev_obs[k])
+                b = abs(obs[k])
+                for level in levels[(a < levels) != (b < levels)]:
+                    events.append(self.findCrossing(k, level, a, b, state, observe))
+        events.sort()
+        events = [(s, self.interpolate(s, state)) for s in events]
+
+        self.prev_state = state
+        self.prev_obs = obs
+        self.prev_valid = valid
+        return events
+
+    def findCrossing(self, k, level, a, b, state, observe):
+        func = lambda s: abs(observe(self.interpolate(s, state))[k]) - level
+        f0 = func(0.0)
+        f1 = func(1.0)
+        if f0 * f1 > 0:
+            #補間の丸め誤差でしきい値ちょうど付近の符号が食い違ったときは線形補間で代用する
+            return (level - a) / (b - a)
+        return brentq(func, 0.0, 1.0, xtol=self.xtol)
+
+    def getState(self):
+        if self.prev_state is None:
+            return {'prev_state': np.zeros(0), 'prev_obs': np.zeros(0), 'prev_valid': np.zeros(0, dtype=bool)}
+        return {'prev_state': self.prev_state, 'prev_obs': self.prev_obs, 'prev_valid': self.prev_valid}
+
+    def setState(self, state):
+        if len(state['prev_state']) == 0:
+            self.prev_state = None
+            self.prev_obs = None
+            self.prev_valid = None
+        else:
+            self.prev_state = np.array(state['prev_state'])
+            self.prev_obs = np.array(state['prev_obs'])
+            self.prev_valid = np.array(state['prev_valid'], dtype=bool)
@@ -1,5 +1,10 @@
+import os
+import sys
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import energy_model
+
 class Swimmer:
     alpha = 1.0e+2
     beta = 9.0e-3
@@ -43,10 +48,29 @@ class Swimmer:
 
         self.torque = np.cross(self.permanent_moment, b_all)
 
+    def angularVelocity(self):
+        return Swimmer.beta * ( 1/(Swimmer.a_l**3) + 1/2 ) * self.torque[2]
+
     def update(self, dt):
-        self.theta += Swimmer.beta * ( 1/(Swimmer.a_l**3) + 1/2 ) * self.torque[2] * dt
+        self.theta += self.angularVelocity() * dt
         self.permanent_moment = np.array([-np.sin(self.theta), np.cos(self.theta), 0.0])
 
+    def getState(self):
+        return {
+            'pos': self.pos,
+            'theta': self.theta,
+            'permanent_moment': self.permanent_moment,
+            'para_moment': self.para_moment,
+            'torque': self.torque,
+            }
+
+    def setState(self, state):
+        self.pos = np.array(state['pos'])
+        self.theta = float(state['theta'])
+        self.permanent_moment = np.array(state['permanent_moment'])
+        self.para_moment = np.array(state['para_moment'])
+        self.torque = np.array(state['torque'])
+
     def particlePosition(self):
         return np.array([
             self.pos - 0.5*self.nx,
@@ -66,91 +90,31 @@ class Swimmer:
             self.para_moment/Swimmer.gamma
             ]).T
 
+    def energyModel(self):
+        if self.flag == False:
+            return 'old'
+        elif self.flag == True:
+            return 'new'
+
     def potentialEnergy(self, x_arr, ext_field):
-        theta_potential = self.extEnergy(self.theta, ext_field) \
-            + self.dipoleEnergy(self.theta)
-
-        if type(x_arr) == np.ndarray:
-            x_potential = []
-            for x in x_arr:
-                x_potential.append(self.extEnergy(x, ext_field) \
-                    + self.dipoleEnergy(x))
-                #x_potential.append(self.extEnergy(x, ext_field))
-        else:
-            x_potential = self.extEnergy(x_arr, ext_field) \
-                    + self.dipoleEnergy(x_arr)
-            #x_potential = self.extEnergy(x_arr, ext_field)
+        theta_potential = energy_model.energy(self.theta, Swimmer.alpha, Swimmer.gamma,
+                ext_field[1], ext_field[0], model=self.energyModel())
+        x_potential = energy_model.energy(x_arr, Swimmer.alpha, Swimmer.gamma,
+                ext_field[1], ext_field[0], model=self.energyModel())
 
         return theta_potential, x_potential
 
-    def extEnergy(self, theta, ext_field):
-        tmp_moment = np.array([
-            -np.sin(theta),
-            np.cos(theta),
-            0
-            ])
-        field = ext_field.copy()
-
-        if self.flag == 0:
-            field += (Swimmer.gamma/Swimmer.alpha) * ext_field[1] * np.array([3*np.sqrt(3)/4, 5/4, 0])
-        elif self.flag == 1:
-            field += (Swimmer.gamma/Swimmer.alpha) * (ext_field[1] - (3*np.sqrt(3)*np.sin(theta - np.pi/3) + 2*np.cos(theta))/Swimmer.alpha) * np.array([3*np.sqrt(3)/4, 5/4, 0])
-
-        ext_energy = -4 * Swimmer.alpha * np.dot(tmp_moment, field)
-        return ext_energy
-
-    def dipoleEnergy(self, theta):
-        dipole_energy = 3 - np.cos(2*theta)
-        return dipole_energy
-
-    def gradientDescent(self, x0, ext_field):
-        x = x0
-        while True:
-            delta = self.gradEnergy(x, ext_field)
-            if abs(delta) < 1.0e-5: break
-            x -= 1.0e-4 * delta
-
-        return x
-
-    def gradEnergy(self, theta, ext_field):
-        if self.flag == 0:
-            grad = self.gradExtEnergy(theta, ext_field) + self.gradDipoleEnergy(theta)
-        elif self.flag == 1:
-            grad = self.gradExtEnergy2(theta, ext_field) + self.gradDipoleEnergy(theta)
-
-        return grad
-
-    #超常磁性に永久磁石の磁場を含まない場合
-    def gradExtEnergy(self, theta, ext_field):
-        tmp_vector = np.array([
-            -np.cos(theta),
-            -np.sin(theta),
-            0
-            ])
-        field = ext_field.copy()
-        field += (Swimmer.gamma/Swimmer.alpha) * ext_field[1] * np.array([3*np.sqrt(3)/4, 5/4, 0])
-        grad_ext_energy = -4 * Swimmer.alpha * np.dot(tmp_vector, field)
-        return grad_ext_energy
-
-    def gradExtEnergy2(self, theta, ext_field):
-        tmp_moment = np.array([
-            -np.sin(theta),
-            np.cos(theta),
-            0
-            ])
-        d_tmp_moment = np.array([
-            -np.cos(theta),
-            -np.sin(theta),
-            0
-            ])
-        field = ext_field.copy()
-        field += (Swimmer.gamma/Swimmer.alpha) * (ext_field[1] - (3*np.sqrt(3)*np.sin(theta - np.pi/3) + 2*np.cos(theta))/Swimmer.alpha) * np.array([3*np.sqrt(3)/4, 5/4, 0])
-
-        d_field = -(Swimmer.gamma/(Swimmer.alpha**2)) * (3*np.sqrt(3)*np.cos(theta - np.pi/3) - 2*np.sin(theta)) * np.array([3*np.sqrt(3)/4, 5/4, 0])
-
-        grad_ext_energy = -4*Swimmer.alpha * (np.dot(tmp_moment, d_field) + np.dot(d_tmp_moment, field))
-        return grad_ext_energy
-
-    def gradDipoleEnergy(self, theta):
-        grad_dipole_energy = 2 * np.sin(2*theta)
-        return grad_dipole_energy
+    #極小点の近くではニュートン法で追跡する (tracked=True)。
+    #ニュートン法の刻みが max_step を超える、または極小点が消えたときは、勾配の下る向きに
+    #max_step だけ進めて次の極小点を探す (tracked=False)。
+    #エネルギーは 2pi 周期なので、結果は theta に最も近い位置に折り返す。
+    def trackPole(self, x, ext_field, max_step=0.1):
+        table = energy_model.coefficients(Swimmer.alpha, Swimmer.gamma,
+                ext_field[1], ext_field[0], model=self.energyModel(), orders=(1, 2))
+        grad, hess = energy_model.evaluate(table, x)
+        tracked = hess > 0 and abs(grad) <= max_step * hess
+        if tracked:
+            x -= grad/hess
+        else:
+            x -= max_step * np.sign(grad)
+        return self.theta + (x - self.theta + np.pi)%(2*np.pi) - np.pi, tracked